@@ -1,40 +1,96 @@
-from flask import Flask, request, jsonify
+from quart import Quart, request, jsonify
+import asyncio
 import logging
 
-from src.classifier import classify_file
-from src.config import ALLOWED_EXTENSIONS, MAX_CONTENT_LENGTH, PORT
-app = Flask(__name__)
+from src.classifier import classify_file, get_queued_classification, queue_file_classification
+from src.config import ALLOWED_EXTENSIONS, MAX_CONCURRENT_CLASSIFY, MAX_CONTENT_LENGTH, PORT
+app = Quart(__name__)
+# Quart rejects larger bodies with a 413 before the request is parsed
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+
+# Bounds concurrent classifications from /classify_files across all requests
+classify_semaphore = asyncio.Semaphore(MAX_CONCURRENT_CLASSIFY)
 
 logging.basicConfig(level=logging.INFO)
 def is_allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def upload_error(file):
+    """
+    Returns the reason an uploaded file cannot be classified, or None if it can.
+    """
+    if file.filename == '':
+        return "No selected file"
+
+    if not is_allowed_file(file.filename):
+        return "File type not allowed"
+
+    return None
+
+@app.errorhandler(413)
+async def request_entity_too_large(error):
+    return jsonify({"error": "File too large"}), 413
+
 @app.route('/')
-def hello():
+async def hello():
     return 'Hello, World!'
 
 @app.route('/classify_file', methods=['POST'])
-def classify_file_route():
+async def classify_file_route():
 
-    if 'file' not in request.files:
+    files = await request.files
+    if 'file' not in files:
         return jsonify({"error": "No file part in the request"}), 400
 
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({"error": "No selected file"}), 400
-
-    if not is_allowed_file(file.filename):
-        return jsonify({"error": f"File type not allowed"}), 400
-
-    if request.content_length > MAX_CONTENT_LENGTH:
-        return jsonify({"error": "File too large"}), 413
+    file = files['file']
+    error = upload_error(file)
+    if error:
+        return jsonify({"error": error}), 400
 
     try:
-        file_class = classify_file(file)
+        # Latency-tolerant callers can opt into the cheaper Gemini Batch API
+        if request.args.get('async') == '1':
+            job_id = await queue_file_classification(file)
+            return jsonify({"job_id": job_id}), 202
+
+        file_class = await classify_file(file)
         return jsonify({"file_class": file_class}), 200
     except Exception as e:
-        app.logger.error(f"Error classifying file: {e}", exc_info=True)
+        app.logger.error("Error classifying file: %s", e, exc_info=True)
         return jsonify({"error": "Internal server error during classification"}), 500
 
+@app.route('/classify_files', methods=['POST'])
+async def classify_files_route():
+
+    files = (await request.files).getlist('files')
+    if not files:
+        return jsonify({"error": "No files part in the request"}), 400
+
+    async def classify_one(file):
+        error = upload_error(file)
+        if error:
+            return {"filename": file.filename, "error": error}
+
+        async with classify_semaphore:
+            try:
+                return {"filename": file.filename, "file_class": await classify_file(file)}
+            except Exception as e:
+                app.logger.error("Error classifying file: %s", e, exc_info=True)
+                return {"filename": file.filename, "error": "Internal server error during classification"}
+
+    # Results are returned in the same order as the uploaded files
+    results = await asyncio.gather(*(classify_one(file) for file in files))
+    return jsonify(results), 200
+
+@app.route('/classify_result/<job_id>', methods=['GET'])
+async def classify_result_route(job_id):
+    status, file_class = await get_queued_classification(job_id)
+    if status is None:
+        return jsonify({"error": "Unknown job id"}), 404
+
+    if file_class is None:
+        return jsonify({"status": status}), 200
+    return jsonify({"status": status, "file_class": file_class}), 200
+
 if __name__ == '__main__':
     app.run(debug=True, port=PORT)
@@ -0,0 +1,245 @@
+"""
+This module provides content-addressed and semantic caching for classification results
+and extracted text.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from cachetools import LRUCache
+
+from src.config import (
+    CACHE_DIR,
+    CLASSIFICATION_CACHE_SIZE,
+    CLASSIFICATION_CACHE_TTL_SECS,
+    EXTRACTION_CACHE_SIZE,
+    LOG_LEVEL,
+    SEMANTIC_CACHE_SIZE,
+    SEMANTIC_CACHE_THRESHOLD,
+)
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=LOG_LEVEL,
+)
+
+
+class DiskStore:
+    """
+    JSON values stored one file per key in a directory, so that they are shared
+    across processes and restarts. Entries expire ttl seconds after they are written.
+    """
+
+    def __init__(self, directory: str, ttl: float):
+        self.directory = directory
+        self.ttl = ttl
+        self._next_prune = 0.0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _is_expired(self, path: str) -> bool:
+        return os.path.getmtime(path) < time.time() - self.ttl
+
+    def get(self, key: str) -> dict | None:
+        """
+        Returns the stored value for the key, or None if it is missing or expired.
+        """
+        path = self._path(key)
+        try:
+            if self._is_expired(path):
+                self.delete(key)
+                return None
+            with open(path, encoding="utf-8") as store_file:
+                return json.load(store_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Could not read stored entry %s: %s", key, e)
+            return None
+
+    def set(self, key: str, value: dict) -> None:
+        """
+        Stores the value, raising OSError if it cannot be written.
+        The file is written atomically so concurrent readers never see partial JSON.
+        """
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        os.makedirs(self.directory, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as store_file:
+            json.dump(value, store_file)
+        os.replace(tmp_path, path)
+        self._prune_if_due()
+
+    def pop(self, key: str) -> dict | None:
+        """
+        Removes and returns the stored value for the key, or None if it is missing.
+        Only one of several processes popping the same key receives the value.
+        """
+        path = self._path(key)
+        claimed_path = f"{path}.{os.getpid()}.{threading.get_ident()}.claimed"
+        try:
+            os.rename(path, claimed_path)
+        except FileNotFoundError:
+            return None
+        try:
+            with open(claimed_path, encoding="utf-8") as store_file:
+                return json.load(store_file)
+        except (OSError, ValueError) as e:
+            logger.warning("Could not read stored entry %s: %s", key, e)
+            return None
+        finally:
+            os.remove(claimed_path)
+
+    def delete(self, key: str) -> None:
+        """
+        Removes the entry for the key, if any.
+        """
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def keys(self) -> list[str]:
+        """
+        Returns the keys of all stored entries, including any not yet pruned after expiring.
+        """
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [name[:-len(".json")] for name in names if name.endswith(".json")]
+
+    def _prune_if_due(self) -> None:
+        """
+        Removes expired entries and leftover temporary files, at most once every
+        tenth of the TTL, so the directory does not grow without bound.
+        """
+        now = time.time()
+        if now < self._next_prune:
+            return
+        self._next_prune = now + self.ttl / 10
+
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError as e:
+            logger.warning("Could not prune %s: %s", self.directory, e)
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < now - self.ttl:
+                    os.remove(entry.path)
+            except OSError:
+                # Another process removed or replaced it first
+                pass
+
+
+class ContentCache:
+    """
+    An in-memory LRU cache keyed on content hashes, optionally backed by a DiskStore
+    so that entries can be reused across processes and restarts.
+    """
+
+    def __init__(self, maxsize: int, store: DiskStore | None = None):
+        self._entries = LRUCache(maxsize=maxsize)
+        self._store = store
+        # cachetools caches are not thread-safe
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> dict | None:
+        """
+        Returns the cached value for the key, or None if it is not cached.
+        """
+        with self._lock:
+            value = self._entries.get(key)
+        if value is not None or self._store is None:
+            return value
+
+        value = self._store.get(key)
+        if value is not None:
+            with self._lock:
+                self._entries[key] = value
+        return value
+
+    def set(self, key: str, value: dict) -> None:
+        """
+        Stores the value in memory and persists it to disk, if backed by a store.
+        """
+        with self._lock:
+            self._entries[key] = value
+
+        if self._store is None:
+            return
+        try:
+            self._store.set(key, value)
+        except OSError as e:
+            # A read-only filesystem should not break classification
+            logger.warning("Could not persist cache entry %s: %s", key, e)
+
+
+class SemanticCache:
+    """
+    An in-memory LRU cache of (embedding, category) pairs.
+    A lookup hits when the cosine similarity to a stored embedding reaches the threshold.
+    """
+
+    def __init__(self, maxsize: int, threshold: float):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        # Unit-length embeddings, one row per slot; allocated on first insert
+        self._vectors: np.ndarray | None = None
+        # Maps slot -> category, ordered from least to most recently used
+        self._categories: OrderedDict[int, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def get(self, vector) -> str | None:
+        """
+        Returns the category of the most similar stored embedding, or None if
+        nothing is similar enough.
+        """
+        query = self._normalize(vector)
+        with self._lock:
+            if not self._categories:
+                return None
+            similarities = self._vectors[:len(self._categories)] @ query
+            slot = int(np.argmax(similarities))
+            if similarities[slot] < self.threshold:
+                return None
+            self._categories.move_to_end(slot)
+            return self._categories[slot]
+
+    def set(self, vector, category: str) -> None:
+        """
+        Stores the embedding, evicting the least recently used entry when full.
+        """
+        normalized = self._normalize(vector)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.maxsize, normalized.size), dtype=np.float32)
+
+            if len(self._categories) < self.maxsize:
+                slot = len(self._categories)
+            else:
+                slot, _ = self._categories.popitem(last=False)
+
+            self._vectors[slot] = normalized
+            self._categories[slot] = category
+
+
+classification_cache = ContentCache(
+    CLASSIFICATION_CACHE_SIZE,
+    DiskStore(os.path.join(CACHE_DIR, "classify"), CLASSIFICATION_CACHE_TTL_SECS),
+)
+# Extracted text can hold personal data, so it is never written to disk
+extraction_cache = ContentCache(EXTRACTION_CACHE_SIZE)
+semantic_cache = SemanticCache(SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD)
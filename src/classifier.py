@@ -1,12 +1,24 @@
 """
 This module provides functions for classifying files based on their content and filename.
 """
+import asyncio
+from contextlib import ExitStack
 import logging
+import threading
 from werkzeug.datastructures import FileStorage
 
+try:
+    import ahocorasick
+except ImportError:
+    # Optional C extension; classify_by_filename falls back to a plain scan
+    ahocorasick = None
+
+from src.cache import classification_cache, extraction_cache
 from src.extractor import extract_text_from_file
-from src.config import FILENAME_CLASSIFICATION_RULES, LOG_LEVEL
+from src.config import FILENAME_RULES_TUPLE, LOG_LEVEL
 from src.gemini import classify_text_with_gemini, classify_file_with_gemini
+from src.gemini_batch import batch_classifier
+from src.upload import SpooledFile, spool_upload
 
 
 logger = logging.getLogger(__name__)
@@ -14,54 +26,131 @@ logging.basicConfig(
     level=LOG_LEVEL,
 )
 
+def _build_filename_automaton():
+    """
+    Builds an Aho-Corasick automaton over all filename keywords, so a filename
+    is matched against every rule in a single scan.
+    Each keyword maps to (rule index, category); the index preserves rule priority.
+    Returns None if pyahocorasick is not installed.
+    """
+    if ahocorasick is None:
+        return None
+
+    automaton = ahocorasick.Automaton()
+    for rule_index, (keywords, category) in enumerate(FILENAME_RULES_TUPLE):
+        for keyword in keywords:
+            # The first rule listing a keyword takes precedence
+            if keyword not in automaton:
+                automaton.add_word(keyword, (rule_index, category))
+    automaton.make_automaton()
+    return automaton
+
+_FILENAME_AUTOMATON = _build_filename_automaton()
+
 def classify_by_filename(file: FileStorage) -> str | None:
     """
     Classifies the file based on keywords in its filename.
     More robust than simple hardcoding.
     """
     filename_lower = file.filename.lower()
-    for rule in FILENAME_CLASSIFICATION_RULES:
-        if any(keyword in filename_lower for keyword in rule["keywords"]):
-            return rule["category"]
+    if _FILENAME_AUTOMATON is None:
+        for keywords, category in FILENAME_RULES_TUPLE:
+            if any(keyword in filename_lower for keyword in keywords):
+                return category
+        return None
 
-    return None
+    matches = (match for _, match in _FILENAME_AUTOMATON.iter(filename_lower))
+    # Rules are checked in order, so the earliest matching rule wins
+    best_match = min(matches, default=None)
+    return best_match[1] if best_match else None
 
-def classify_by_content(file: FileStorage) -> str | None:
+def _extract_text(
+    file: FileStorage, spooled: SpooledFile, stop: threading.Event | None = None
+) -> str | None:
+    """
+    Extracts text from the spooled file, reusing the text extracted from identical
+    contents if this process still has it cached.
+    Extraction ends early once stop is set; the partial text is not cached.
+    """
+    cached = extraction_cache.get(spooled.sha256)
+    if cached:
+        logger.debug("Extracted text cache hit for %s (%s)", file.filename, spooled.sha256)
+        return cached["text"]
+
+    extracted_text = extract_text_from_file(spooled.path, file.filename, spooled.header, stop)
+    if extracted_text and not (stop and stop.is_set()):
+        extraction_cache.set(spooled.sha256, {"text": extracted_text})
+    return extracted_text
+
+async def classify_by_content(file: FileStorage, spooled: SpooledFile) -> str | None:
     """
     Classify the file based on its content, using Gemini.
     Attempts to extract text from the file, and if successful, classifies the file using Gemini.
     Returns the predicted category name if successful and valid, otherwise None.
     """
-    extracted_text = extract_text_from_file(file)
+    # Extraction (PDF parsing, OCR) is blocking, so keep it off the event loop
+    stop_extraction = threading.Event()
+    extraction = asyncio.ensure_future(
+        asyncio.to_thread(_extract_text, file, spooled, stop_extraction)
+    )
+    try:
+        # Cancelling this task cannot interrupt the thread, so it is shielded
+        extracted_text = await asyncio.shield(extraction)
+    except asyncio.CancelledError:
+        # Skip the remaining pages, and return only once the spooled file is no longer read
+        stop_extraction.set()
+        await asyncio.wait([extraction])
+        raise
     if extracted_text:
         # Log a snippet
         logger.debug("Extracted text for %s: %s...", file.filename, extracted_text) 
 
-        gemini_classification = classify_text_with_gemini(extracted_text)
+        gemini_classification = await classify_text_with_gemini(extracted_text)
         if gemini_classification:
             logger.debug("Gemini classification for %s: %s", file.filename, gemini_classification)
             return gemini_classification
 
     return None
 
-def classify_by_file(file: FileStorage) -> str | None:
+async def classify_by_file(file: FileStorage, spooled: SpooledFile) -> str | None:
     """
-    Classify the file using the Gemini API, uploading the file to the API directly.
+    Classify the file using the Gemini API, uploading the spooled file to the API directly.
     Returns the predicted category name if successful and valid, otherwise None.
     """
-    gemini_classification = classify_file_with_gemini(file)
+    gemini_classification = await classify_file_with_gemini(
+        spooled.path, file.mimetype or None, spooled.sha256
+    )
     if gemini_classification:
         logger.debug("Gemini classification for %s: %s", file.filename, gemini_classification)
         return gemini_classification
 
     return None
 
-def classify_file(file: FileStorage):
+# Strong references keep background cleanups from being garbage collected mid-run
+_background_cleanups: set[asyncio.Task] = set()
+
+def _close_when_done(tasks: list[asyncio.Task], cleanup: ExitStack) -> None:
+    """
+    Closes the cleanup stack, deleting the spooled file, once the tasks have finished.
+    Runs in the background so that a response does not wait for a losing task.
+    """
+    async def wait_and_close():
+        try:
+            await asyncio.wait(tasks)
+        finally:
+            cleanup.close()
+
+    cleanup_task = asyncio.create_task(wait_and_close())
+    _background_cleanups.add(cleanup_task)
+    cleanup_task.add_done_callback(_background_cleanups.discard)
+
+async def classify_file(file: FileStorage):
     """
     Classifies the file using a multi-step approach:
     1. Filename-based classification (as an initial hint or fallback).
-    2. Content-based classification using Gemini.
-    3. Whole file classification using Gemini.
+    2. Cached result for identical file contents, if any.
+    3. Content-based classification using Gemini, and
+    4. Whole file classification using Gemini, run concurrently.
     Returns the predicted category name.
     """
     # Step 1: Attempt classification by filename
@@ -70,17 +159,69 @@ def classify_file(file: FileStorage):
         return category_from_filename
 
     logger.debug("No filename-based classification for %s", file.filename)
-   
-    # Step 2: Content-based classification
-    category_from_content = classify_by_content(file)
-    if category_from_content:
-        return category_from_content
 
-    logger.debug("Extracted text empty for %s", file.filename)
+    # The upload is read once: spooling to disk also computes the content hash
+    with ExitStack() as cleanup:
+        spooled = cleanup.enter_context(spool_upload(file))
 
-    # Step 3: Attempt whole file classification with Gemini
-    category_from_file = classify_by_file(file)
-    if category_from_file:
-        return category_from_file
+        # Step 2: Identical bytes have been classified before
+        cached = classification_cache.get(spooled.sha256)
+        if cached:
+            logger.debug("Cache hit for %s (%s)", file.filename, spooled.sha256)
+            return cached["category"]
+
+        # Steps 3 and 4: Race content-based and whole file classification,
+        # taking the first answer that is not "unknown file".
+        # Both read the same spooled copy of the upload.
+        tasks = [
+            asyncio.create_task(classify_by_content(file, spooled)),
+            asyncio.create_task(classify_by_file(file, spooled)),
+        ]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                category = await next_result
+                if category and category != "unknown file":
+                    classification_cache.set(spooled.sha256, {"category": category})
+                    return category
+        finally:
+            for task in tasks:
+                task.cancel()
+            # A cancelled extraction only stops after its current page, or after a whole
+            # image OCR run, and reads the spooled file until then. Delete the file once
+            # it has stopped, without delaying the response.
+            pending = [task for task in tasks if not task.done()]
+            if pending:
+                _close_when_done(pending, cleanup.pop_all())
 
     return "unknown file"
+
+async def queue_file_classification(file: FileStorage) -> str:
+    """
+    Queues the file for classification with the Gemini Batch API.
+    Filename-based and cached results are recorded immediately; files without
+    extractable text fall back to synchronous whole file classification.
+    Returns a request id to poll with get_queued_classification.
+    """
+    category_from_filename = classify_by_filename(file)
+    if category_from_filename:
+        return batch_classifier.resolve(category_from_filename)
+
+    with spool_upload(file) as spooled:
+        cached = classification_cache.get(spooled.sha256)
+        if cached:
+            return batch_classifier.resolve(cached["category"])
+
+        extracted_text = await asyncio.to_thread(_extract_text, file, spooled)
+        if extracted_text:
+            # Submitting a full buffer uploads it to Gemini, so keep it off the event loop
+            return await asyncio.to_thread(batch_classifier.submit, extracted_text)
+
+        logger.debug("Extracted text empty for %s, classifying synchronously", file.filename)
+        return batch_classifier.resolve(await classify_by_file(file, spooled) or "unknown file")
+
+async def get_queued_classification(request_id: str) -> tuple[str | None, str | None]:
+    """
+    Returns the (status, category) of a queued classification.
+    The status is None if the request id is unknown.
+    """
+    return await asyncio.to_thread(batch_classifier.result, request_id)
@@ -9,6 +9,31 @@ ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'doc', 'docx', 'xls', 'xlsx'}
 # Maximum file size for upload (e.g., 10MB)
 MAX_CONTENT_LENGTH = 10 * 1024 * 1024
 
+# Maximum number of files classified concurrently by /classify_files
+MAX_CONCURRENT_CLASSIFY = int(os.environ.get("MAX_CONCURRENT_CLASSIFY") or 8)
+
+# Directory for on-disk caches, shared between worker processes
+CACHE_DIR = os.environ.get("CACHE_DIR") or ".cache"
+# Number of classification results kept in memory per process
+CLASSIFICATION_CACHE_SIZE = int(os.environ.get("CLASSIFICATION_CACHE_SIZE") or 1024)
+# Classification results are removed from disk this long after they were written
+CLASSIFICATION_CACHE_TTL_SECS = int(os.environ.get("CLASSIFICATION_CACHE_TTL_SECS") or 24 * 60 * 60)
+# Number of extracted texts kept in memory per process; they are never written to disk
+EXTRACTION_CACHE_SIZE = int(os.environ.get("EXTRACTION_CACHE_SIZE") or 256)
+
+# OCR: images are downscaled so their longest side is at most this many pixels
+OCR_MAX_DIMENSION = 2000
+# Resolution at which scanned PDF pages are rendered for OCR
+OCR_PDF_DPI = 150
+# LSTM engine only, treating the page as a single block of text
+TESSERACT_CONFIG = os.environ.get("TESSERACT_CONFIG") or "--oem 1 --psm 6"
+# libmagic identifies file types from this many leading bytes
+MIME_HEADER_BYTES = int(os.environ.get("MIME_HEADER_BYTES") or 8192)
+# Scanned PDFs with at least this many pages are OCRed on PDF_WORKERS threads.
+# Each server worker process has its own pool, so keep this small.
+PDF_PARALLEL_MIN_PAGES = 4
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS") or 2)
+
 # Rules for filename-based classification
 # This provides a basic level of classification and can be expanded.
 # For more robust classification, content analysis is preferred.
@@ -25,11 +50,44 @@ FILENAME_CLASSIFICATION_RULES = [
     {"keywords": ["tax_form", "tax form"], "category": "tax_form"},
     {"keywords": ["work_permit", "work permit"], "category": "work_permit"},
 ]
-POSSIBLE_CATEGORIES = list(set(rule["category"] for rule in FILENAME_CLASSIFICATION_RULES))
+# The rules frozen into ((keywords, ...), category) tuples, lowercased for matching
+FILENAME_RULES_TUPLE = tuple(
+    (tuple(keyword.lower() for keyword in rule["keywords"]), rule["category"].lower())
+    for rule in FILENAME_CLASSIFICATION_RULES
+)
+POSSIBLE_CATEGORIES = frozenset(rule["category"] for rule in FILENAME_CLASSIFICATION_RULES)
+# Categories as listed in Gemini prompts; sorted so prompts are identical across processes
+CATEGORIES_LIST_STR = ", ".join(f"'{cat}'" for cat in sorted(POSSIBLE_CATEGORIES))
 
 # Gemini API Key
 # It's best practice to load this from an environment variable
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 # Allow experimentation with different Gemini models - easy to switch
 GEMINI_MODEL = os.environ.get("GEMINI_MODEL") or "gemini-1.5-flash"
+# HTTP connection pool shared by all Gemini calls in a process
+GEMINI_MAX_CONNECTIONS = int(os.environ.get("GEMINI_MAX_CONNECTIONS") or 100)
+GEMINI_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("GEMINI_MAX_KEEPALIVE_CONNECTIONS") or 50)
+GEMINI_TIMEOUT_SECS = float(os.environ.get("GEMINI_TIMEOUT_SECS") or 30)
+# Uploaded files are reused for identical contents for this long
+GEMINI_FILE_CACHE_SIZE = 1024
+GEMINI_FILE_CACHE_TTL_SECS = 36 * 60 * 60
+# Number of characters of extracted text sent to Gemini for classification
+GEMINI_TEXT_LIMIT = 4000
+# Extraction stops once this many characters have been collected. Twice the
+# Gemini limit leaves headroom for whitespace stripped from the text.
+MAX_EXTRACTED_TEXT_CHARS = 8192
+
+# Embedding model used to look up near-duplicate documents in the semantic cache
+GEMINI_EMBEDDING_MODEL = os.environ.get("GEMINI_EMBEDDING_MODEL") or "gemini-embedding-001"
+EMBEDDING_DIMENSIONS = 256
+
+# Semantic cache: reuse a previous classification when a document's embedding is
+# at least this similar (cosine) to one already classified
+SEMANTIC_CACHE_ENABLED = (os.environ.get("SEMANTIC_CACHE_ENABLED") or "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD") or 0.93)
+SEMANTIC_CACHE_SIZE = int(os.environ.get("SEMANTIC_CACHE_SIZE") or 1024)
 
+# Gemini Batch API: queued classifications are submitted once the buffer holds
+# this many requests, or when the flush interval elapses
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE") or 100)
+BATCH_FLUSH_INTERVAL_SECS = float(os.environ.get("BATCH_FLUSH_INTERVAL_SECS") or 60)
@@ -1,20 +1,84 @@
 """
 This module provides functions for classifying text or files using the Gemini API.
 """
-import tempfile
-import os
 import logging
-from werkzeug.datastructures import FileStorage
-from google import genai
+import os
+import ssl
 
-from src.config import  GEMINI_API_KEY, GEMINI_MODEL, POSSIBLE_CATEGORIES, LOG_LEVEL
+import certifi
+import httpx
+from cachetools import TTLCache
+from google import genai
+from google.genai import types
+
+from src.cache import semantic_cache
+from src.config import (
+    CATEGORIES_LIST_STR,
+    EMBEDDING_DIMENSIONS,
+    GEMINI_API_KEY,
+    GEMINI_EMBEDDING_MODEL,
+    GEMINI_FILE_CACHE_SIZE,
+    GEMINI_FILE_CACHE_TTL_SECS,
+    GEMINI_MAX_CONNECTIONS,
+    GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+    GEMINI_MODEL,
+    GEMINI_TEXT_LIMIT,
+    GEMINI_TIMEOUT_SECS,
+    LOG_LEVEL,
+    POSSIBLE_CATEGORIES,
+    SEMANTIC_CACHE_ENABLED,
+)
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(
     level=LOG_LEVEL,
 )
 
-client = genai.Client(api_key=GEMINI_API_KEY)
+# One client per process, so concurrent requests share pooled keep-alive connections.
+# HTTP/2 lets parallel Gemini calls multiplex over a single TLS connection.
+# Explicit transports keep the SDK on httpx even if aiohttp is installed.
+_connection_limits = httpx.Limits(
+    max_connections=GEMINI_MAX_CONNECTIONS,
+    max_keepalive_connections=GEMINI_MAX_KEEPALIVE_CONNECTIONS,
+)
+# httpx ignores the client's verify setting when given a transport, so the transports
+# need the same context the SDK would build, honouring SSL_CERT_FILE and SSL_CERT_DIR
+_ssl_context = ssl.create_default_context(
+    cafile=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+    capath=os.environ.get("SSL_CERT_DIR"),
+)
+client = genai.Client(
+    api_key=GEMINI_API_KEY,
+    http_options=types.HttpOptions(
+        timeout=int(GEMINI_TIMEOUT_SECS * 1000),  # milliseconds
+        client_args={
+            "verify": _ssl_context,
+            "transport": httpx.HTTPTransport(
+                verify=_ssl_context, limits=_connection_limits, http2=True
+            ),
+        },
+        async_client_args={
+            "verify": _ssl_context,
+            "transport": httpx.AsyncHTTPTransport(
+                verify=_ssl_context, limits=_connection_limits, http2=True
+            ),
+        },
+    ),
+)
+
+# Maps content hash -> File resource already uploaded to Gemini.
+# Gemini keeps uploaded files for 48 hours, so entries expire well before that.
+# Only accessed from the event loop thread, so no lock is needed.
+_uploaded_files = TTLCache(maxsize=GEMINI_FILE_CACHE_SIZE, ttl=GEMINI_FILE_CACHE_TTL_SECS)
+
+# The whole file prompt does not depend on the request, so build it once
+FILE_PROMPT = (
+    f"Please classify the attached file into one of these categories: {CATEGORIES_LIST_STR}.\n"
+    f"Respond with only the category name. If none of the categories fit well, respond with 'unknown file'.\n\n"
+)
+
+# Drops single and double quotes from a prediction in one pass
+_QUOTE_TABLE = str.maketrans("", "", "'\"")
 
 def _clean_and_validate_prediction(prediction_text: str) -> str:
     """
@@ -26,7 +90,9 @@ def _clean_and_validate_prediction(prediction_text: str) -> str:
     Returns:
         A valid category string or "unknown file".
     """
-    cleaned_prediction = prediction_text.strip().lower().replace("'", "")
+    cleaned_prediction = prediction_text.strip().translate(_QUOTE_TABLE).lower()
+    if not cleaned_prediction:
+        return "unknown file"
     if cleaned_prediction in POSSIBLE_CATEGORIES:
         return cleaned_prediction
     
@@ -37,7 +103,40 @@ def _clean_and_validate_prediction(prediction_text: str) -> str:
     return "unknown file"
 
 
-def classify_text_with_gemini(text: str) -> str | None:
+def build_text_prompt(text: str) -> str:
+    """
+    Builds the prompt asking Gemini to classify the given document text.
+    """
+    # Ensure categories are clearly listed for the model
+    return (
+        f"Please classify the following document text into one of these categories: {CATEGORIES_LIST_STR}.\n"
+        f"Respond with only the category name. If none of the categories fit well, respond with 'unknown file'.\n\n"
+        # Limit text length if necessary - current limit is 4000 characters for safety.
+        f"Document Text:\n\"\"\"\n{text[:GEMINI_TEXT_LIMIT]}\n\"\"\"" 
+    )
+
+
+async def _embed_text(text: str) -> list[float] | None:
+    """
+    Embeds the text for semantic cache lookups.
+
+    Returns:
+        The embedding values, or None if the embedding call fails.
+    """
+    try:
+        response = await client.aio.models.embed_content(
+            model=GEMINI_EMBEDDING_MODEL,
+            contents=text,
+            config=types.EmbedContentConfig(output_dimensionality=EMBEDDING_DIMENSIONS),
+        )
+        return response.embeddings[0].values
+    except Exception as e:
+        # The cache is an optimisation; classification can proceed without it
+        logger.warning("Error embedding text for semantic cache: %s", e)
+        return None
+
+
+async def classify_text_with_gemini(text: str) -> str | None:
     """
     Classifies the given text into one of the possible categories using the Gemini API.
 
@@ -54,78 +153,84 @@ def classify_text_with_gemini(text: str) -> str | None:
         logger.warning("No text provided to classify_text_with_gemini.")
         return None
 
-    try:
-        # Ensure categories are clearly listed for the model
-        categories_list_str = ", ".join(f"'{cat}'" for cat in POSSIBLE_CATEGORIES)
-        prompt = (
-            f"Please classify the following document text into one of these categories: {categories_list_str}.\n"
-            f"Respond with only the category name. If none of the categories fit well, respond with 'unknown file'.\n\n"
-            # Limit text length if necessary - current limit is 4000 characters for safety.
-            f"Document Text:\n\"\"\"\n{text[:4000]}\n\"\"\"" 
-        )
+    # Embed only the text the model would see
+    text = text[:GEMINI_TEXT_LIMIT]
 
-        response = client.models.generate_content(
+    # Near-duplicates of previously classified documents skip the generation call
+    embedding = await _embed_text(text) if SEMANTIC_CACHE_ENABLED else None
+    if embedding is not None:
+        cached_category = semantic_cache.get(embedding)
+        if cached_category:
+            logger.debug("Semantic cache hit: %s", cached_category)
+            return cached_category
+
+    try:
+        response = await client.aio.models.generate_content(
             model=f"models/{GEMINI_MODEL}",  # Use fully qualified model name
-            contents=prompt
+            contents=build_text_prompt(text)
         )
         
-        return _clean_and_validate_prediction(response.text)
+        category = _clean_and_validate_prediction(response.text)
+        if embedding is not None and category != "unknown file":
+            semantic_cache.set(embedding, category)
+        return category
 
     except Exception as e:
         logger.error("Error during Gemini API call: %s", e, exc_info=True)
         return None
 
-def classify_file_with_gemini(file: FileStorage) -> str | None:
+async def classify_file_with_gemini(
+    path: str, mime_type: str | None = None, content_hash: str | None = None
+) -> str | None:
     """
     Attach the file to the Gemini model and return the predicted category
+
+    Args:
+        path: The path of the file on disk, e.g. a spooled upload.
+        mime_type: The file's MIME type; guessed from the path's extension if not given.
+        content_hash: SHA-256 of the contents. When given, a previous upload of the
+            same contents is reused instead of uploading the file again.
     """
     if not GEMINI_API_KEY:
         logger.error("GEMINI_API_KEY is not configured. Cannot use Gemini for file classification.")
         return None
 
-    if not file:
+    if not path:
         logger.warning("No file provided to classify_file_with_gemini.")
         return None
 
     try:
-        # Create a temporary file to store the FileStorage content
-        # The Gemini API's upload_file method expects a file path.
-        file_suffix = os.path.splitext(file.filename or "")[1]
-        with tempfile.NamedTemporaryFile(delete=True, suffix=file_suffix) as tmp_file:
-            file.seek(0)
-             # Save FileStorage contents to the temporary file
-            file.save(tmp_file.name) 
-            # Ensure all data is written to disk
-            tmp_file.flush() 
-
+        gemini_file_resource = _uploaded_files.get(content_hash) if content_hash else None
+        if gemini_file_resource:
+            logger.debug("Reusing Gemini upload %s for %s", gemini_file_resource.name, path)
+        else:
             # Upload the file to Gemini using its path
-            logger.debug("Uploading file to Gemini: %s", tmp_file.name)
-            
-            gemini_file_resource = client.files.upload(
-                file=tmp_file.name,  # Pass the path of the temporary file
+            logger.debug("Uploading file to Gemini: %s", path)
+
+            gemini_file_resource = await client.aio.files.upload(
+                file=path,
                 config=dict(
-                  mime_type=file.mimetype
+                  mime_type=mime_type
                 )
             )
+            if gemini_file_resource and content_hash:
+                _uploaded_files[content_hash] = gemini_file_resource
 
         # Proceed with classification using the uploaded file resource
         if gemini_file_resource:
-            categories_list_str = ", ".join(f"'{cat}'" for cat in POSSIBLE_CATEGORIES)
-            prompt = (
-                f"Please classify the attached file into one of these categories: {categories_list_str}.\n"
-                f"Respond with only the category name. If none of the categories fit well, respond with 'unknown file'.\n\n"
-            )
-            
-            response = client.models.generate_content(
+            response = await client.aio.models.generate_content(
                 model=f"models/{GEMINI_MODEL}", # Use fully qualified model name
-                contents=[prompt, gemini_file_resource] # Use the file resource from upload_file
+                contents=[FILE_PROMPT, gemini_file_resource] # Use the file resource from upload_file
             )
             return _clean_and_validate_prediction(response.text)
         else:
-            logger.error("Failed to upload file %s to Gemini.", file.filename)
+            logger.error("Failed to upload file %s to Gemini.", path)
             return None
 
     except Exception as e:
         logger.error("Error during Gemini API call: %s", e, exc_info=True)
+        # The upload may have expired or been deleted; upload again next time
+        if content_hash:
+            _uploaded_files.pop(content_hash, None)
         return None
     
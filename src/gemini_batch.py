@@ -0,0 +1,232 @@
+"""
+This module provides queued text classification using the Gemini Batch API.
+Batch jobs are cheaper than individual calls but complete asynchronously, so
+callers receive a request id and poll for the result.
+"""
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from google.genai import types
+
+from src.cache import DiskStore
+from src.config import BATCH_FLUSH_INTERVAL_SECS, BATCH_MAX_SIZE, CACHE_DIR, GEMINI_MODEL, LOG_LEVEL
+from src.gemini import _clean_and_validate_prediction, build_text_prompt, client
+
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=LOG_LEVEL,
+)
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# Batch jobs may take up to 24 hours to complete
+REQUEST_TTL_SECS = 48 * 60 * 60
+
+FAILED_JOB_STATES = {
+    types.JobState.JOB_STATE_FAILED,
+    types.JobState.JOB_STATE_CANCELLED,
+    types.JobState.JOB_STATE_EXPIRED,
+}
+
+
+class BatchClassifier:
+    """
+    Buffers classification prompts and submits them to Gemini as batch jobs.
+    All state is kept in files under a directory, so any server worker can accept
+    a request, flush the buffer or answer a poll, and nothing is lost on restart.
+    """
+
+    def __init__(self, directory: str, max_size: int, flush_interval: float):
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        # Maps request_id -> {"status", "job", "category", "created"}
+        self._requests = DiskStore(os.path.join(directory, "requests"), REQUEST_TTL_SECS)
+        # Maps request_id -> {"prompt"} for requests not yet submitted
+        self._pending = DiskStore(os.path.join(directory, "pending"), REQUEST_TTL_SECS)
+        # Maps job key -> {"name", "requests"} for submitted batch jobs
+        self._jobs = DiskStore(os.path.join(directory, "jobs"), REQUEST_TTL_SECS)
+        # Flushes this process's submissions; a poll flushes them if the process is gone
+        self._timer: threading.Timer | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, text: str) -> str:
+        """
+        Queues the text for classification and returns a request id.
+        """
+        request_id = uuid.uuid4().hex
+        self._requests.set(request_id, {
+            "status": STATUS_PENDING, "job": None, "category": None, "created": time.time(),
+        })
+        self._pending.set(request_id, {"prompt": build_text_prompt(text)})
+
+        if len(self._pending.keys()) >= self.max_size:
+            self.flush()
+        else:
+            with self._lock:
+                if self._timer is None:
+                    self._timer = threading.Timer(self.flush_interval, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        return request_id
+
+    def resolve(self, category: str) -> str:
+        """
+        Records a result that was determined without Gemini and returns its request id,
+        so callers can poll for every queued file the same way.
+        """
+        request_id = uuid.uuid4().hex
+        self._requests.set(request_id, {
+            "status": STATUS_DONE, "job": None, "category": category, "created": time.time(),
+        })
+        return request_id
+
+    def flush(self) -> None:
+        """
+        Submits all buffered prompts, from any process, as batch jobs.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        batch = []
+        for request_id in self._pending.keys():
+            # Another process flushing at the same time claims a disjoint set of prompts
+            entry = self._pending.pop(request_id)
+            if entry is not None:
+                batch.append((request_id, entry["prompt"]))
+
+        for start in range(0, len(batch), self.max_size):
+            self._submit_batch(batch[start:start + self.max_size])
+
+    def result(self, request_id: str) -> tuple[str | None, str | None]:
+        """
+        Returns the (status, category) of a queued request.
+        The status is None if the request id is unknown or has expired.
+        """
+        entry = self._requests.get(request_id)
+        if entry is None:
+            return None, None
+        if entry["status"] != STATUS_PENDING:
+            return entry["status"], entry["category"]
+
+        if entry["job"] is None:
+            # The process that buffered the request may have exited before flushing it
+            if time.time() - entry["created"] >= self.flush_interval:
+                self.flush()
+        else:
+            self._collect_job(entry["job"])
+
+        entry = self._requests.get(request_id) or entry
+        return entry["status"], entry["category"]
+
+    @staticmethod
+    def _job_key(job_name: str) -> str:
+        # Job names look like "batches/123"
+        return job_name.replace("/", "_")
+
+    def _set_status(self, request_ids, status: str, job_name: str | None = None,
+                    categories: dict[str, str] | None = None) -> None:
+        for request_id in request_ids:
+            entry = self._requests.get(request_id)
+            if entry is not None:
+                entry["status"] = status
+                entry["job"] = job_name
+                if categories is not None:
+                    entry["category"] = categories.get(request_id)
+                self._requests.set(request_id, entry)
+
+    def _submit_batch(self, batch: list[tuple[str, str]]) -> None:
+        """
+        Uploads the prompts as a JSONL file and creates a batch job for them.
+        """
+        request_ids = [request_id for request_id, _ in batch]
+        lines = (
+            json.dumps({
+                "key": request_id,
+                "request": {"contents": [{"role": "user", "parts": [{"text": prompt}]}]},
+            })
+            for request_id, prompt in batch
+        )
+        buffer = io.BytesIO("\n".join(lines).encode("utf-8"))
+
+        try:
+            batch_file = client.files.upload(
+                file=buffer,
+                config=types.UploadFileConfig(mime_type="jsonl"),
+            )
+            batch_job = client.batches.create(
+                model=f"models/{GEMINI_MODEL}",
+                src=batch_file.name,
+            )
+        except Exception as e:
+            logger.error("Error submitting Gemini batch of %d requests: %s", len(batch), e, exc_info=True)
+            self._set_status(request_ids, STATUS_FAILED)
+            return
+
+        logger.info("Submitted Gemini batch job %s with %d requests", batch_job.name, len(batch))
+        self._jobs.set(self._job_key(batch_job.name), {"name": batch_job.name, "requests": request_ids})
+        self._set_status(request_ids, STATUS_PENDING, batch_job.name)
+
+    def _parse_results(self, job_name: str, results: bytes) -> dict[str, str]:
+        """
+        Returns the category of each request that succeeded, keyed by request id.
+        Lines that cannot be parsed are logged and skipped.
+        """
+        categories = {}
+        for line in results.decode("utf-8", errors="replace").splitlines():
+            if not line.strip():
+                continue
+            try:
+                output = json.loads(line)
+                request_id = output["key"]
+            except (ValueError, KeyError, TypeError) as e:
+                logger.error("Skipping malformed line in results of Gemini batch job %s: %s", job_name, e)
+                continue
+            try:
+                prediction = output["response"]["candidates"][0]["content"]["parts"][0]["text"]
+                categories[request_id] = _clean_and_validate_prediction(prediction)
+            except (KeyError, IndexError, TypeError, AttributeError):
+                logger.error("Gemini batch request %s failed: %s", request_id, output.get("error"))
+        return categories
+
+    def _collect_job(self, job_name: str) -> None:
+        """
+        Checks the batch job and records results for all of its requests once it has finished.
+        """
+        job = self._jobs.get(self._job_key(job_name))
+        if job is None:
+            return
+
+        try:
+            batch_job = client.batches.get(name=job_name)
+            if batch_job.state in FAILED_JOB_STATES:
+                logger.error("Gemini batch job %s ended in state %s", job_name, batch_job.state)
+                results = None
+            elif batch_job.state == types.JobState.JOB_STATE_SUCCEEDED:
+                results = client.files.download(file=batch_job.dest.file_name)
+            else:
+                return
+        except Exception as e:
+            logger.error("Error checking Gemini batch job %s: %s", job_name, e, exc_info=True)
+            return
+
+        categories = self._parse_results(job_name, results) if results is not None else {}
+        done = [request_id for request_id in job["requests"] if request_id in categories]
+        # Requests missing from the output file will never complete
+        failed = [request_id for request_id in job["requests"] if request_id not in categories]
+        self._set_status(done, STATUS_DONE, job_name, categories)
+        self._set_status(failed, STATUS_FAILED, job_name)
+        self._jobs.delete(self._job_key(job_name))
+
+
+batch_classifier = BatchClassifier(
+    os.path.join(CACHE_DIR, "batch"), BATCH_MAX_SIZE, BATCH_FLUSH_INTERVAL_SECS
+)
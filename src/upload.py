@@ -0,0 +1,50 @@
+"""
+This module provides helpers for spooling uploaded files to disk.
+"""
+from contextlib import contextmanager
+from typing import Iterator, NamedTuple
+import hashlib
+import os
+import tempfile
+
+from werkzeug.datastructures import FileStorage
+
+from src.config import MIME_HEADER_BYTES
+
+SPOOL_CHUNK_SIZE = 64 * 1024
+
+
+class SpooledFile(NamedTuple):
+    """
+    An uploaded file copied to disk.
+    """
+    # Path of the temporary copy
+    path: str
+    # SHA-256 hex digest of the contents
+    sha256: str
+    # Leading bytes of the contents, enough for MIME type detection
+    header: bytes
+
+
+@contextmanager
+def spool_upload(file: FileStorage) -> Iterator[SpooledFile]:
+    """
+    Streams the uploaded file to a temporary file in 64 KiB chunks, hashing it in the
+    same pass, so the contents are read once and never held in memory as a whole.
+    The first MIME_HEADER_BYTES are kept in memory for MIME type detection.
+    The temporary file keeps the upload's extension and is deleted on exit.
+    """
+    file_suffix = os.path.splitext(file.filename or "")[1]
+    hasher = hashlib.sha256()
+    header = b""
+    with tempfile.NamedTemporaryFile(delete=True, suffix=file_suffix) as tmp_file:
+        file.stream.seek(0)
+        for chunk in iter(lambda: file.stream.read(SPOOL_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+            if len(header) < MIME_HEADER_BYTES:
+                header += chunk[:MIME_HEADER_BYTES - len(header)]
+            tmp_file.write(chunk)
+        # Ensure all data is written to disk before other readers open the path
+        tmp_file.flush()
+        file.stream.seek(0)
+        yield SpooledFile(tmp_file.name, hasher.hexdigest(), header)
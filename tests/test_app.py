@@ -1,13 +1,15 @@
 from io import BytesIO
 
 import pytest
+from werkzeug.datastructures import FileStorage, MultiDict
+from werkzeug.test import encode_multipart
+
 from src.app import app, is_allowed_file
 
 @pytest.fixture
 def client():
     app.config['TESTING'] = True
-    with app.test_client() as client:
-        yield client
+    return app.test_client()
 
 
 @pytest.mark.parametrize("filename, expected", [
@@ -20,19 +22,86 @@ def client():
 def test_allowed_file(filename, expected):
     assert is_allowed_file(filename) == expected
 
-def test_no_file_in_request(client):
-    response = client.post('/classify_file')
+@pytest.mark.asyncio
+async def test_no_file_in_request(client):
+    response = await client.post('/classify_file')
     assert response.status_code == 400
 
-def test_no_selected_file(client):
-    data = {'file': (BytesIO(b""), '')}  # Empty filename
-    response = client.post('/classify_file', data=data, content_type='multipart/form-data')
+@pytest.mark.asyncio
+async def test_no_selected_file(client):
+    files = {'file': FileStorage(BytesIO(b""), filename='')}  # Empty filename
+    response = await client.post('/classify_file', files=files)
     assert response.status_code == 400
 
-def test_success(client, mocker):
+@pytest.mark.asyncio
+async def test_file_too_large(client, mocker, monkeypatch):
+    monkeypatch.setitem(app.config, 'MAX_CONTENT_LENGTH', 100)
+    classify_file = mocker.patch('src.app.classify_file', return_value='test_class')
+
+    files = {'file': FileStorage(BytesIO(b"x" * 1000), filename='file.pdf')}
+    response = await client.post('/classify_file', files=files)
+    assert response.status_code == 413
+    assert await response.get_json() == {"error": "File too large"}
+    classify_file.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_success(client, mocker):
     mocker.patch('src.app.classify_file', return_value='test_class')
 
-    data = {'file': (BytesIO(b"dummy content"), 'file.pdf')}
-    response = client.post('/classify_file', data=data, content_type='multipart/form-data')
+    files = {'file': FileStorage(BytesIO(b"dummy content"), filename='file.pdf')}
+    response = await client.post('/classify_file', files=files)
+    assert response.status_code == 200
+    assert await response.get_json() == {"file_class": "test_class"}
+
+@pytest.mark.asyncio
+async def test_classify_files(client, mocker):
+    async def fake_classify_file(file):
+        return f"class_of_{file.filename}"
+    mocker.patch('src.app.classify_file', side_effect=fake_classify_file)
+
+    # Quart's test client only sends one file per field, so encode the body directly
+    boundary, body = encode_multipart(MultiDict([
+        ('files', FileStorage(BytesIO(b"first"), filename='a.pdf')),
+        ('files', FileStorage(BytesIO(b"second"), filename='b.txt')),
+        ('files', FileStorage(BytesIO(b"third"), filename='c.jpg')),
+    ]))
+    response = await client.post(
+        '/classify_files',
+        data=body,
+        headers={'Content-Type': f'multipart/form-data; boundary={boundary}'},
+    )
     assert response.status_code == 200
-    assert response.get_json() == {"file_class": "test_class"}
+    assert await response.get_json() == [
+        {"filename": "a.pdf", "file_class": "class_of_a.pdf"},
+        {"filename": "b.txt", "error": "File type not allowed"},
+        {"filename": "c.jpg", "file_class": "class_of_c.jpg"},
+    ]
+
+@pytest.mark.asyncio
+async def test_classify_files_without_files(client):
+    response = await client.post('/classify_files')
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_async_classification(client, mocker):
+    mocker.patch('src.app.queue_file_classification', return_value='job-1')
+
+    files = {'file': FileStorage(BytesIO(b"dummy content"), filename='file.pdf')}
+    response = await client.post('/classify_file?async=1', files=files)
+    assert response.status_code == 202
+    assert await response.get_json() == {"job_id": "job-1"}
+
+@pytest.mark.asyncio
+async def test_classify_result(client, mocker):
+    mocker.patch('src.app.get_queued_classification', return_value=('done', 'test_class'))
+
+    response = await client.get('/classify_result/job-1')
+    assert response.status_code == 200
+    assert await response.get_json() == {"status": "done", "file_class": "test_class"}
+
+@pytest.mark.asyncio
+async def test_classify_result_unknown_job(client, mocker):
+    mocker.patch('src.app.get_queued_classification', return_value=(None, None))
+
+    response = await client.get('/classify_result/missing')
+    assert response.status_code == 404
@@ -0,0 +1,62 @@
+import os
+import time
+
+from src.cache import ContentCache, DiskStore, SemanticCache
+
+
+def test_cache_miss(tmp_path):
+    cache = ContentCache(maxsize=2, store=DiskStore(str(tmp_path), ttl=60))
+    assert cache.get("abc") is None
+
+def test_cache_persists_across_instances(tmp_path):
+    ContentCache(maxsize=2, store=DiskStore(str(tmp_path), ttl=60)).set("abc", {"category": "invoice"})
+    assert (tmp_path / "abc.json").exists()
+    assert ContentCache(maxsize=2, store=DiskStore(str(tmp_path), ttl=60)).get("abc") == {"category": "invoice"}
+
+def test_cache_without_store_stays_in_memory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache = ContentCache(maxsize=2)
+    cache.set("abc", {"text": "Passport"})
+    assert cache.get("abc") == {"text": "Passport"}
+    assert os.listdir(tmp_path) == []
+
+def test_disk_store_expires_entries(tmp_path):
+    store = DiskStore(str(tmp_path), ttl=60)
+    store.set("abc", {"category": "invoice"})
+    old = time.time() - 120
+    os.utime(tmp_path / "abc.json", (old, old))
+
+    assert store.get("abc") is None
+    assert not (tmp_path / "abc.json").exists()
+
+def test_disk_store_prunes_expired_entries(tmp_path):
+    store = DiskStore(str(tmp_path), ttl=60)
+    store.set("old", {"category": "invoice"})
+    old = time.time() - 120
+    os.utime(tmp_path / "old.json", (old, old))
+
+    DiskStore(str(tmp_path), ttl=60).set("new", {"category": "receipt"})
+    assert store.keys() == ["new"]
+
+def test_disk_store_pop(tmp_path):
+    store = DiskStore(str(tmp_path), ttl=60)
+    store.set("abc", {"prompt": "text"})
+    assert store.pop("abc") == {"prompt": "text"}
+    assert store.pop("abc") is None
+    assert os.listdir(tmp_path) == []
+
+def test_semantic_cache_threshold():
+    cache = SemanticCache(maxsize=2, threshold=0.9)
+    cache.set([1.0, 0.0], "invoice")
+    assert cache.get([2.0, 0.1]) == "invoice"
+    assert cache.get([0.0, 1.0]) is None
+
+def test_semantic_cache_evicts_least_recently_used():
+    cache = SemanticCache(maxsize=2, threshold=0.9)
+    cache.set([1.0, 0.0], "invoice")
+    cache.set([0.0, 1.0], "receipt")
+    cache.get([1.0, 0.0])
+    cache.set([1.0, 1.0], "passport")
+    assert cache.get([1.0, 0.0]) == "invoice"
+    assert cache.get([0.0, 1.0]) is None
+    assert cache.get([1.0, 1.0]) == "passport"
@@ -0,0 +1,119 @@
+import asyncio
+from io import BytesIO
+import os
+import threading
+import time
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from src.classifier import _background_cleanups, classify_by_filename, classify_file
+
+
+FILENAME_CASES = [
+    ("drivers_license_1.jpg", "drivers_licence"),
+    ("Bank_Statement_2.pdf", "bank_statement"),
+    ("invoice_dl.pdf", "drivers_licence"),  # Earlier rules take precedence
+    ("file_1.jpg", None),
+]
+
+@pytest.mark.parametrize("filename, expected", FILENAME_CASES)
+def test_classify_by_filename(filename, expected):
+    assert classify_by_filename(FileStorage(filename=filename)) == expected
+
+@pytest.mark.parametrize("filename, expected", FILENAME_CASES)
+def test_classify_by_filename_without_ahocorasick(filename, expected, mocker):
+    mocker.patch('src.classifier._FILENAME_AUTOMATON', None)
+    assert classify_by_filename(FileStorage(filename=filename)) == expected
+
+@pytest.fixture
+def classification_cache(mocker):
+    cache = mocker.patch('src.classifier.classification_cache')
+    cache.get.return_value = None
+    return cache
+
+def _upload():
+    return FileStorage(stream=BytesIO(b"%PDF-1.7"), filename="scan.pdf")
+
+@pytest.mark.asyncio
+async def test_classify_file_takes_first_known_answer(mocker, classification_cache):
+    file_cancelled = asyncio.Event()
+
+    async def classify_by_file(file, spooled):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            file_cancelled.set()
+            raise
+
+    mocker.patch('src.classifier.classify_by_content', return_value="invoice")
+    mocker.patch('src.classifier.classify_by_file', side_effect=classify_by_file)
+
+    assert await classify_file(_upload()) == "invoice"
+    assert file_cancelled.is_set()
+    classification_cache.set.assert_called_once_with(mocker.ANY, {"category": "invoice"})
+
+@pytest.mark.asyncio
+async def test_classify_file_skips_unknown_answer(mocker, classification_cache):
+    async def classify_by_file(file, spooled):
+        await asyncio.sleep(0.01)
+        return "receipt"
+
+    mocker.patch('src.classifier.classify_by_content', return_value="unknown file")
+    mocker.patch('src.classifier.classify_by_file', side_effect=classify_by_file)
+
+    assert await classify_file(_upload()) == "receipt"
+
+@pytest.mark.asyncio
+async def test_classify_file_unknown_when_both_fail(mocker, classification_cache):
+    mocker.patch('src.classifier.classify_by_content', return_value="unknown file")
+    mocker.patch('src.classifier.classify_by_file', return_value=None)
+
+    assert await classify_file(_upload()) == "unknown file"
+    classification_cache.set.assert_not_called()
+
+async def _wait_for_background_cleanups():
+    while _background_cleanups:
+        await asyncio.wait(list(_background_cleanups))
+
+@pytest.mark.asyncio
+async def test_classify_file_stops_losing_extraction(mocker, classification_cache):
+    extraction_finished = threading.Event()
+
+    def extract_text(file, spooled, stop=None):
+        # Blocks like a long OCR run until the other task wins
+        assert stop.wait(5)
+        assert os.path.exists(spooled.path)
+        extraction_finished.set()
+        return "partial text"
+
+    mocker.patch('src.classifier._extract_text', side_effect=extract_text)
+    classify_text = mocker.patch('src.classifier.classify_text_with_gemini')
+    mocker.patch('src.classifier.classify_by_file', return_value="invoice")
+
+    assert await classify_file(_upload()) == "invoice"
+    await _wait_for_background_cleanups()
+    assert extraction_finished.is_set()
+    classify_text.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_classify_file_returns_before_slow_extraction(mocker, classification_cache):
+    spooled_paths = []
+
+    def extract_text(file, spooled, stop=None):
+        # A single image OCR run cannot check the stop event
+        spooled_paths.append(spooled.path)
+        time.sleep(0.5)
+        assert os.path.exists(spooled.path)
+        return "text"
+
+    mocker.patch('src.classifier._extract_text', side_effect=extract_text)
+    mocker.patch('src.classifier.classify_by_file', return_value="invoice")
+
+    started = time.monotonic()
+    assert await classify_file(_upload()) == "invoice"
+    assert time.monotonic() - started < 0.25
+
+    # The spooled file is deleted only once the extraction has finished
+    await _wait_for_background_cleanups()
+    assert not os.path.exists(spooled_paths[0])
@@ -0,0 +1,130 @@
+import threading
+
+import openpyxl
+import pymupdf
+from PIL import Image
+import pytesseract
+
+from src.extractor import _ocr_image, extract_text_from_file
+
+
+def test_extract_text_from_xlsx(tmp_path):
+    path = tmp_path / "sheet.xlsx"
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["Invoice", 42, None, "Total"])
+    workbook.create_sheet("Second").append(["Due date"])
+    workbook.save(path)
+
+    assert extract_text_from_file(str(path)) == "Invoice\nTotal\nDue date"
+
+def test_extract_text_from_xlsx_named_xls(tmp_path):
+    path = tmp_path / "sheet.xlsx"
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["Invoice"])
+    workbook.save(path)
+    misnamed_path = path.rename(tmp_path / "report.xls")
+
+    assert extract_text_from_file(str(misnamed_path)) == "Invoice"
+
+def test_extract_text_stops_at_limit(tmp_path, mocker):
+    mocker.patch('src.extractor.MAX_EXTRACTED_TEXT_CHARS', 10)
+    path = tmp_path / "sheet.xlsx"
+    workbook = openpyxl.Workbook()
+    for row in range(100):
+        workbook.active.append([f"row {row}"])
+    workbook.save(path)
+
+    assert extract_text_from_file(str(path)) == "row 0\nrow 1"
+
+def test_extract_text_stops_when_stop_is_set(tmp_path):
+    path = tmp_path / "sheet.xlsx"
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["Invoice"])
+    workbook.save(path)
+    stop = threading.Event()
+    stop.set()
+
+    assert extract_text_from_file(str(path), stop=stop) is None
+
+def test_extract_text_from_plain_text(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("Bank statement\n")
+
+    assert extract_text_from_file(str(path)) == "Bank statement"
+
+def test_extract_text_detects_type_from_header(tmp_path, mocker):
+    from_buffer = mocker.patch('src.extractor.magic.from_buffer', return_value='text/plain')
+    path = tmp_path / "notes"
+    path.write_text("Bank statement\n")
+
+    assert extract_text_from_file(str(path), header=b"Bank") == "Bank statement"
+    from_buffer.assert_called_once_with(b"Bank", mime=True)
+
+def test_extract_text_from_pdf():
+    text = extract_text_from_file("files/invoice_2.pdf")
+    assert text.startswith("Invoice Date :")
+
+def test_extract_text_from_pdf_reads_text_layer_without_workers(tmp_path, mocker):
+    mocker.patch('src.extractor.PDF_PARALLEL_MIN_PAGES', 2)
+    render_pdf_page = mocker.patch('src.extractor._render_pdf_page')
+    path = tmp_path / "pages.pdf"
+    with pymupdf.open() as document:
+        for page_number in range(5):
+            document.new_page().insert_text((72, 72), f"Page {page_number}")
+        document.save(path)
+
+    text = extract_text_from_file(str(path))
+    assert [line for line in text.splitlines() if line] == [f"Page {n}" for n in range(5)]
+    render_pdf_page.assert_not_called()
+
+def test_extract_text_from_scanned_pdf_pages_in_parallel(tmp_path, mocker):
+    mocker.patch('src.extractor.PDF_PARALLEL_MIN_PAGES', 2)
+    mocker.patch('src.extractor.PDF_WORKERS', 2)
+    mocker.patch('src.extractor._render_pdf_page', side_effect=lambda page: page.number)
+
+    def ocr_page(page_number):
+        if page_number == 1:
+            raise pytesseract.TesseractError(1, "failed")
+        return f"Page {page_number}"
+
+    mocker.patch('src.extractor._ocr_image', side_effect=ocr_page)
+    path = tmp_path / "scan.pdf"
+    with pymupdf.open() as document:
+        for _ in range(5):
+            document.new_page()
+        document.save(path)
+
+    text = extract_text_from_file(str(path))
+    assert text.splitlines() == ["Page 0", "Page 2", "Page 3", "Page 4"]
+
+def test_extract_text_from_pdf_with_blank_cover(tmp_path, mocker):
+    image_to_string = mocker.patch('src.extractor.pytesseract.image_to_string')
+    path = tmp_path / "cover.pdf"
+    with pymupdf.open() as document:
+        document.new_page()
+        document.new_page().insert_text((72, 72), "Invoice number 123 total due")
+        document.save(path)
+
+    assert extract_text_from_file(str(path)) == "Invoice number 123 total due"
+    image_to_string.assert_not_called()
+
+def test_extract_text_from_scanned_pdf_skips_failed_pages(tmp_path, mocker):
+    mocker.patch(
+        'src.extractor.pytesseract.image_to_string',
+        side_effect=[pytesseract.TesseractError(1, "failed"), "Bank statement"],
+    )
+    path = tmp_path / "scan.pdf"
+    with pymupdf.open() as document:
+        document.new_page()
+        document.new_page()
+        document.save(path)
+
+    assert extract_text_from_file(str(path)) == "Bank statement"
+
+def test_ocr_image_is_grayscale_and_downscaled(mocker):
+    image_to_string = mocker.patch('src.extractor.pytesseract.image_to_string', return_value='text')
+
+    assert _ocr_image(Image.new("RGB", (4000, 1000))) == 'text'
+    ocr_input = image_to_string.call_args.args[0]
+    assert ocr_input.mode == "L"
+    assert ocr_input.size == (2000, 500)
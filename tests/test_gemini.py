@@ -0,0 +1,77 @@
+from cachetools import TTLCache
+from google.genai import types
+import pytest
+
+from src.cache import SemanticCache
+from src.gemini import (
+    _clean_and_validate_prediction,
+    classify_file_with_gemini,
+    classify_text_with_gemini,
+)
+
+
+@pytest.mark.parametrize("prediction, expected", [
+    ("invoice", "invoice"),
+    (" 'Bank_Statement'\n", "bank_statement"),
+    ('"receipt"', "receipt"),
+    ("", "unknown file"),
+    ("recipe", "unknown file"),
+])
+def test_clean_and_validate_prediction(prediction, expected):
+    assert _clean_and_validate_prediction(prediction) == expected
+
+@pytest.fixture
+def client(mocker):
+    client = mocker.patch('src.gemini.client')
+    client.aio.files.upload = mocker.AsyncMock(return_value=types.File(name="files/abc"))
+    client.aio.models.generate_content = mocker.AsyncMock(
+        return_value=mocker.Mock(text="invoice")
+    )
+    mocker.patch('src.gemini._uploaded_files', TTLCache(maxsize=10, ttl=60))
+    return client
+
+@pytest.mark.asyncio
+async def test_classify_file_reuses_upload_for_same_contents(client):
+    assert await classify_file_with_gemini("a.pdf", "application/pdf", "hash") == "invoice"
+    assert await classify_file_with_gemini("b.pdf", "application/pdf", "hash") == "invoice"
+
+    client.aio.files.upload.assert_awaited_once()
+    assert client.aio.models.generate_content.await_count == 2
+
+@pytest.mark.asyncio
+async def test_classify_file_evicts_upload_after_error(client):
+    client.aio.models.generate_content.side_effect = RuntimeError("file expired")
+    assert await classify_file_with_gemini("a.pdf", "application/pdf", "hash") is None
+
+    client.aio.models.generate_content.side_effect = None
+    assert await classify_file_with_gemini("a.pdf", "application/pdf", "hash") == "invoice"
+    assert client.aio.files.upload.await_count == 2
+
+@pytest.fixture
+def semantic_cache(mocker, client):
+    mocker.patch('src.gemini.SEMANTIC_CACHE_ENABLED', True)
+    client.aio.models.embed_content = mocker.AsyncMock(
+        return_value=mocker.Mock(embeddings=[mocker.Mock(values=[1.0, 0.0])])
+    )
+    return mocker.patch('src.gemini.semantic_cache', SemanticCache(maxsize=10, threshold=0.9))
+
+@pytest.mark.asyncio
+async def test_classify_text_semantic_cache_hit(client, semantic_cache):
+    semantic_cache.set([1.0, 0.1], "receipt")
+
+    assert await classify_text_with_gemini("Thank you for your purchase") == "receipt"
+    client.aio.models.generate_content.assert_not_awaited()
+
+@pytest.mark.asyncio
+async def test_classify_text_semantic_cache_miss_stores_result(client, semantic_cache):
+    assert await classify_text_with_gemini("Invoice number 123") == "invoice"
+    client.aio.models.generate_content.assert_awaited_once()
+
+    assert semantic_cache.get([1.0, 0.0]) == "invoice"
+
+@pytest.mark.asyncio
+async def test_classify_text_does_not_cache_unknown(client, semantic_cache):
+    client.aio.models.generate_content.return_value.text = "recipe"
+
+    assert await classify_text_with_gemini("Pancakes") == "unknown file"
+    assert semantic_cache.get([1.0, 0.0]) is None
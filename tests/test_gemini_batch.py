@@ -0,0 +1,86 @@
+import json
+
+from google.genai import types
+import pytest
+
+from src.gemini_batch import BatchClassifier, STATUS_DONE, STATUS_FAILED, STATUS_PENDING
+
+
+@pytest.fixture
+def client(mocker):
+    client = mocker.patch('src.gemini_batch.client')
+    client.files.upload.return_value.name = "files/input"
+    client.batches.create.return_value.name = "batches/123"
+    return client
+
+def _job(state, file_name=None):
+    return types.BatchJob(
+        name="batches/123", state=state, dest=types.BatchJobDestination(file_name=file_name)
+    )
+
+def _output(request_id, text):
+    return json.dumps({
+        "key": request_id,
+        "response": {"candidates": [{"content": {"parts": [{"text": text}]}}]},
+    })
+
+def test_submit_flushes_full_buffer(tmp_path, client):
+    classifier = BatchClassifier(str(tmp_path), max_size=2, flush_interval=60)
+    first = classifier.submit("Invoice number 123")
+    client.files.upload.assert_not_called()
+    second = classifier.submit("Bank statement")
+
+    client.files.upload.assert_called_once()
+    lines = client.files.upload.call_args.kwargs["file"].getvalue().decode().splitlines()
+    assert sorted(json.loads(line)["key"] for line in lines) == sorted([first, second])
+    client.batches.create.assert_called_once()
+
+    client.batches.get.return_value = _job(types.JobState.JOB_STATE_RUNNING)
+    assert classifier.result(first) == (STATUS_PENDING, None)
+
+def test_poll_from_another_process_flushes_after_interval(tmp_path, client):
+    request_id = BatchClassifier(str(tmp_path), max_size=10, flush_interval=60).submit("Invoice")
+    client.batches.get.return_value = _job(types.JobState.JOB_STATE_RUNNING)
+
+    other_process = BatchClassifier(str(tmp_path), max_size=10, flush_interval=0)
+    assert other_process.result(request_id) == (STATUS_PENDING, None)
+    client.batches.create.assert_called_once()
+    assert other_process.result("unknown") == (None, None)
+
+def test_results_file_parsing(tmp_path, client):
+    classifier = BatchClassifier(str(tmp_path), max_size=10, flush_interval=60)
+    done, failed, missing = (classifier.submit(text) for text in ["a", "b", "c"])
+    classifier.flush()
+
+    client.batches.get.return_value = _job(types.JobState.JOB_STATE_SUCCEEDED, "files/output")
+    client.files.download.return_value = "\n".join([
+        _output(done, "'Invoice'"),
+        json.dumps({"key": failed, "error": {"code": 400}}),
+        "{not json",
+        "",
+    ]).encode()
+
+    assert classifier.result(done) == (STATUS_DONE, "invoice")
+    assert classifier.result(failed) == (STATUS_FAILED, None)
+    assert classifier.result(missing) == (STATUS_FAILED, None)
+    # Results are recorded once, for every request of the job
+    client.files.download.assert_called_once()
+
+def test_failed_job(tmp_path, client):
+    classifier = BatchClassifier(str(tmp_path), max_size=10, flush_interval=60)
+    request_id = classifier.submit("Invoice")
+    classifier.flush()
+
+    client.batches.get.return_value = _job(types.JobState.JOB_STATE_FAILED)
+    assert classifier.result(request_id) == (STATUS_FAILED, None)
+
+def test_failed_submission(tmp_path, client):
+    client.batches.create.side_effect = RuntimeError("quota exceeded")
+    classifier = BatchClassifier(str(tmp_path), max_size=1, flush_interval=60)
+
+    request_id = classifier.submit("Invoice")
+    assert classifier.result(request_id) == (STATUS_FAILED, None)
+
+def test_resolve(tmp_path):
+    classifier = BatchClassifier(str(tmp_path), max_size=10, flush_interval=60)
+    assert classifier.result(classifier.resolve("passport")) == (STATUS_DONE, "passport")
@@ -0,0 +1,28 @@
+import hashlib
+from io import BytesIO
+import os
+
+from werkzeug.datastructures import FileStorage
+
+from src.upload import spool_upload
+
+
+def test_spool_upload():
+    file = FileStorage(stream=BytesIO(b"dummy content"), filename="file.pdf")
+    with spool_upload(file) as spooled:
+        assert spooled.path.endswith(".pdf")
+        with open(spooled.path, "rb") as spooled_file:
+            assert spooled_file.read() == b"dummy content"
+        assert spooled.sha256 == hashlib.sha256(b"dummy content").hexdigest()
+        assert spooled.header == b"dummy content"
+
+    assert not os.path.exists(spooled.path)
+    # The stream is rewound for any later reader
+    assert file.read() == b"dummy content"
+
+def test_spool_upload_keeps_only_header(mocker):
+    mocker.patch('src.upload.MIME_HEADER_BYTES', 4)
+    mocker.patch('src.upload.SPOOL_CHUNK_SIZE', 3)
+    file = FileStorage(stream=BytesIO(b"%PDF-1.7 body"), filename="file.pdf")
+    with spool_upload(file) as spooled:
+        assert spooled.header == b"%PDF"